@@ -3,6 +3,21 @@ Package for Subhue API integration.
 This module provides tools for communicating with the Subhue API.
 """
 
+from .circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    OpenPolicy,
+)
+from .scheduler import Priority, SendScheduler
 from .subhue_api import SubhueAPI
 
-__all__ = ["SubhueAPI"]
+__all__ = [
+    "SubhueAPI",
+    "SendScheduler",
+    "Priority",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "CircuitState",
+    "OpenPolicy",
+]
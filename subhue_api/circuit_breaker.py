@@ -0,0 +1,534 @@
+"""
+Circuit breaker module for protecting Subhue API calls.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from .client import ApiClient
+
+
+class CircuitState(Enum):
+    """Estados do circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class OpenPolicy(Enum):
+    """O que fazer com um lote enquanto o circuito está aberto."""
+
+    WAIT = "wait"
+    SPOOL = "spool"
+    SHED = "shed"
+
+
+class CircuitOpenError(Exception):
+    """Erro lançado quando uma requisição é recusada com o circuito aberto."""
+
+    def __init__(
+        self,
+        message: str,
+        spooled: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.spooled = spooled
+        self.retry_after = retry_after
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """
+    Indica se o erro reflete indisponibilidade do backend.
+
+    Timeouts, erros de conexão, respostas 5xx e 429 contam como falha. Demais
+    erros HTTP (400, 422, etc.) vêm de dados inválidos e não indicam backend
+    indisponível.
+    """
+    if isinstance(
+        error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+    ):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return (
+            response is None
+            or response.status_code >= 500
+            or response.status_code == 429
+        )
+    return False
+
+
+class CircuitBreaker:
+    """
+    Controla os estados fechado/aberto/meio-aberto a partir da taxa de falhas
+    das últimas requisições.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        open_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        health_check: Optional[Callable[[], bool]] = None,
+    ):
+        """
+        Inicializa o circuit breaker.
+
+        Args:
+            failure_rate_threshold: Taxa de falhas (0 a 1) que abre o circuito
+            window_size: Número de requisições recentes consideradas na taxa
+            minimum_calls: Mínimo de requisições na janela antes de avaliar a taxa
+            open_timeout: Segundos com o circuito aberto antes de testar o backend
+            half_open_max_calls: Requisições de teste permitidas no estado meio-aberto
+            health_check: Verificação barata do backend, executada antes de
+                liberar as requisições de teste
+        """
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold deve estar entre 0 e 1.")
+
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.health_check = health_check
+
+        self._outcomes: deque = deque(maxlen=window_size)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+        self._generation = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        """Estado atual do circuito."""
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        """Taxa de falhas na janela atual."""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def allow_request(self) -> Optional[int]:
+        """
+        Indica se uma requisição pode ser enviada.
+
+        Com o circuito aberto, após ``open_timeout`` segundos a verificação de
+        saúde é executada (fora do lock, por um único chamador; os demais são
+        recusados enquanto ela ocorre). Se o backend responder, o circuito
+        passa a meio-aberto e libera ``half_open_max_calls`` requisições de
+        teste.
+
+        Returns:
+            Optional[int]: Geração do circuito em que a requisição foi admitida,
+                a ser repassada a ``record_success``/``record_failure``, ou None
+                se a requisição foi recusada
+        """
+        with self._lock:
+            probe = self._state == CircuitState.OPEN
+            if probe:
+                if self._probing or self.retry_after() > 0:
+                    return None
+                self._probing = True
+
+        if probe:
+            healthy = self._probe()
+            with self._lock:
+                self._probing = False
+                if not healthy:
+                    self._opened_at = time.monotonic()
+                    return None
+                self._transition(CircuitState.HALF_OPEN)
+
+        with self._lock:
+            if self._state == CircuitState.OPEN:
+                return None
+            if self._state == CircuitState.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    return None
+                self._half_open_calls += 1
+            return self._generation
+
+    def retry_after(self) -> float:
+        """Segundos até a próxima verificação de saúde com o circuito aberto."""
+        if self._state != CircuitState.OPEN:
+            return 0.0
+        return max(self._opened_at + self.open_timeout - time.monotonic(), 0.0)
+
+    def record_success(self, generation: int):
+        """
+        Registra uma requisição bem-sucedida.
+
+        Resultados de requisições admitidas em um estado anterior do circuito
+        são ignorados.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._state == CircuitState.HALF_OPEN:
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CircuitState.CLOSED)
+                return
+            self._outcomes.append(True)
+
+    def record_failure(self, generation: int):
+        """
+        Registra uma requisição com falha.
+
+        Resultados de requisições admitidas em um estado anterior do circuito
+        são ignorados.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._state == CircuitState.HALF_OPEN:
+                self._transition(CircuitState.OPEN)
+                return
+            self._outcomes.append(False)
+            if (
+                self._state == CircuitState.CLOSED
+                and len(self._outcomes) >= self.minimum_calls
+                and self.failure_rate >= self.failure_rate_threshold
+            ):
+                self._transition(CircuitState.OPEN)
+
+    def reset(self):
+        """Fecha o circuito e limpa o histórico de requisições."""
+        with self._lock:
+            self._transition(CircuitState.CLOSED)
+
+    def _probe(self) -> bool:
+        """Executa a verificação de saúde, se configurada."""
+        if self.health_check is None:
+            return True
+        try:
+            healthy = bool(self.health_check())
+        except Exception as e:
+            logging.error(f"Erro na verificação de saúde da API: {e}")
+            healthy = False
+        logging.info(f"🩺 Verificação de saúde da API: {'ok' if healthy else 'falhou'}")
+        return healthy
+
+    def _transition(self, state: CircuitState):
+        """Altera o estado do circuito. Deve ser chamado com o lock."""
+        if state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+            logging.warning(
+                f"🔴 Circuito aberto (taxa de falhas: {self.failure_rate:.0%}). Novas tentativas em {self.open_timeout}s."
+            )
+        elif state == CircuitState.HALF_OPEN:
+            logging.info("🟡 Circuito meio-aberto. Enviando requisição de teste.")
+        elif self._state != CircuitState.CLOSED:
+            logging.info("🟢 Circuito fechado. Envio retomado.")
+
+        self._state = state
+        self._generation += 1
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+        if state == CircuitState.CLOSED:
+            self._outcomes.clear()
+
+
+class PayloadSpool:
+    """Armazena em disco, em JSON Lines, os lotes recusados com o circuito aberto."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.draining_path = f"{path}.draining"
+        self.offset_path = f"{path}.offset"
+        self.corrupt_path = f"{path}.corrupt"
+        self._lock = threading.Lock()
+
+    def append(self, data: List[Dict], method: str = "POST"):
+        """Adiciona um lote ao spool."""
+        line = json.dumps({"method": method, "data": data}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a+b") as spool_file:
+                # Isola uma linha truncada por uma escrita interrompida
+                if spool_file.tell() > 0:
+                    spool_file.seek(-1, os.SEEK_END)
+                    if spool_file.read(1) != b"\n":
+                        spool_file.write(b"\n")
+                spool_file.write(line.encode("utf-8") + b"\n")
+
+    def __len__(self) -> int:
+        with self._lock:
+            count = 0
+            if os.path.exists(self.draining_path):
+                with open(self.draining_path, "rb") as spool_file:
+                    spool_file.seek(self._read_offset())
+                    count += sum(1 for line in spool_file if line.strip())
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as spool_file:
+                    count += sum(1 for line in spool_file if line.strip())
+            return count
+
+    def drain(self) -> Iterator[Tuple[List[Dict], str]]:
+        """
+        Retira todos os lotes do spool.
+
+        O arquivo é renomeado antes da leitura, de modo que lotes adicionados
+        durante o reenvio vão para um novo spool. Cada lote é dado como
+        retirado quando o próximo é solicitado; a posição de leitura é salva
+        em disco e um reenvio interrompido é retomado na próxima chamada a
+        partir do primeiro lote não retirado. Linhas inválidas são movidas
+        para ``corrupt_path``.
+        """
+        with self._lock:
+            if not os.path.exists(self.draining_path):
+                if not os.path.exists(self.path):
+                    return
+                os.replace(self.path, self.draining_path)
+                self._write_offset(0)
+
+        offset = self._read_offset()
+        with open(self.draining_path, "rb") as spool_file:
+            spool_file.seek(offset)
+            for raw_line in spool_file:
+                offset += len(raw_line)
+                if raw_line.strip():
+                    try:
+                        entry = json.loads(raw_line)
+                        data, method = entry["data"], entry["method"]
+                    except (ValueError, KeyError, TypeError) as e:
+                        logging.error(
+                            f"Linha inválida no spool movida para {self.corrupt_path}: {e}"
+                        )
+                        with open(self.corrupt_path, "ab") as corrupt_file:
+                            corrupt_file.write(raw_line.rstrip(b"\n") + b"\n")
+                    else:
+                        yield data, method
+                self._write_offset(offset)
+
+        with self._lock:
+            os.remove(self.draining_path)
+            os.remove(self.offset_path)
+
+    def _read_offset(self) -> int:
+        """Lê a posição de leitura salva do arquivo em reenvio."""
+        try:
+            with open(self.offset_path, encoding="utf-8") as offset_file:
+                return int(offset_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int):
+        """Salva a posição de leitura do arquivo em reenvio."""
+        temp_path = f"{self.offset_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as offset_file:
+            offset_file.write(str(offset))
+        os.replace(temp_path, self.offset_path)
+
+
+class CircuitBreakerClient(ApiClient):
+    """Cliente de API que protege outro cliente com um circuit breaker."""
+
+    def __init__(
+        self,
+        api_client: ApiClient,
+        circuit_breaker: CircuitBreaker,
+        spool: Optional[PayloadSpool] = None,
+        is_failure: Callable[[Exception], bool] = is_backend_failure,
+        open_policy: Optional[OpenPolicy] = None,
+        max_wait: Optional[float] = None,
+        poll_interval: float = 1.0,
+        flush_timeout: float = 60.0,
+    ):
+        """
+        Inicializa o cliente protegido.
+
+        Args:
+            api_client: Cliente que efetivamente envia as requisições; deve
+                lançar exceção em caso de falha
+            circuit_breaker: Circuit breaker que controla o envio
+            spool: Destino dos lotes recusados com o circuito aberto, usado
+                pela política ``OpenPolicy.SPOOL``
+            is_failure: Indica se uma exceção do cliente conta como falha do
+                backend; as demais são relançadas sem afetar o circuito
+            open_policy: O que fazer com os lotes enquanto o circuito está
+                aberto. Padrão: ``SPOOL`` se houver spool, senão ``WAIT``
+            max_wait: Tempo máximo, em segundos, de espera de cada lote na
+                política ``WAIT``; sem ele, aguarda até o backend voltar
+            poll_interval: Intervalo mínimo entre novas tentativas na política
+                ``WAIT``
+            flush_timeout: Tempo máximo, em segundos, que ``flush_spool``
+                aguarda o circuito fechar
+        """
+        if open_policy is None:
+            open_policy = OpenPolicy.SPOOL if spool is not None else OpenPolicy.WAIT
+        if open_policy == OpenPolicy.SPOOL and spool is None:
+            raise ValueError("A política SPOOL exige um spool.")
+
+        self.api_client = api_client
+        self.circuit_breaker = circuit_breaker
+        self.spool = spool
+        self.is_failure = is_failure
+        self.open_policy = open_policy
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.flush_timeout = flush_timeout
+
+        self._spool_pending = False
+        self._replay_lock = threading.Lock()
+
+    def send_request(
+        self, data: List[Dict], method: str = "POST", blocking: bool = True
+    ) -> Any:
+        """
+        Envia a requisição se o circuito permitir.
+
+        Na política ``WAIT``, aguarda a próxima verificação de saúde e envia
+        o lote assim que o backend voltar; com ``blocking=False``, recusa o
+        lote informando em ``retry_after`` quando tentar novamente. Na
+        política ``SPOOL``, os lotes guardados são reenviados automaticamente
+        após o primeiro envio bem-sucedido com o circuito fechado.
+
+        Raises:
+            CircuitOpenError: Se o lote foi recusado com o circuito aberto;
+                ``spooled`` indica se ele foi guardado no spool
+        """
+        generation = self._admit(data, method, blocking)
+        result = self._send(data, method, generation)
+
+        if self._spool_pending and self.circuit_breaker.state == CircuitState.CLOSED:
+            self.replay_spool()
+        return result
+
+    def replay_spool(self) -> int:
+        """
+        Reenvia os lotes guardados no spool.
+
+        Nunca aguarda o circuito: se ele estiver aberto, o reenvio é
+        interrompido e os lotes restantes permanecem no spool. Lotes recusados
+        por indisponibilidade do backend voltam para o spool; lotes rejeitados
+        por dados inválidos são descartados.
+
+        Returns:
+            int: Número de lotes reenviados com sucesso
+        """
+        if self.spool is None or not self._replay_lock.acquire(blocking=False):
+            return 0
+
+        sent = 0
+        entries = self.spool.drain()
+        try:
+            self._spool_pending = False
+            for data, method in entries:
+                generation = self.circuit_breaker.allow_request()
+                if generation is None:
+                    logging.warning(
+                        "⏸️ Circuito aberto: reenvio do spool interrompido. Lotes restantes mantidos."
+                    )
+                    self._spool_pending = True
+                    break
+                try:
+                    self._send(data, method, generation)
+                    sent += 1
+                except Exception as e:
+                    if self.is_failure(e):
+                        self._spool(data, method)
+                    else:
+                        logging.error(f"❌ Lote do spool rejeitado pela API: {e}")
+        finally:
+            entries.close()
+            self._replay_lock.release()
+        if sent:
+            logging.info(f"📤 Lotes reenviados do spool: {sent}")
+        return sent
+
+    def flush_spool(self, timeout: Optional[float] = None) -> int:
+        """
+        Aguarda o circuito fechar e reenvia os lotes guardados no spool.
+
+        Args:
+            timeout: Tempo máximo de espera, em segundos. Padrão:
+                ``flush_timeout``. Lotes não reenviados nesse prazo permanecem
+                no spool
+
+        Returns:
+            int: Número de lotes reenviados com sucesso
+        """
+        timeout = self.flush_timeout if timeout is None else timeout
+        end = time.monotonic() + timeout
+        sent = self.replay_spool()
+        while self._spool_pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                logging.warning(
+                    f"⏳ Circuito ainda aberto após {timeout}s: lotes mantidos em {self.spool.path}."
+                )
+                break
+            wait = max(self.circuit_breaker.retry_after(), self.poll_interval)
+            time.sleep(min(wait, remaining))
+            sent += self.replay_spool()
+        return sent
+
+    def _admit(self, data: List[Dict], method: str, blocking: bool = True) -> int:
+        """Obtém permissão do circuito, aplicando a política de circuito aberto."""
+        generation = self.circuit_breaker.allow_request()
+        if generation is not None:
+            return generation
+
+        if self.open_policy == OpenPolicy.SPOOL:
+            self._spool(data, method)
+            raise CircuitOpenError(
+                "Circuito aberto: lote enviado ao spool.", spooled=True
+            )
+        if self.open_policy == OpenPolicy.SHED:
+            raise CircuitOpenError("Circuito aberto: lote descartado.")
+        if not blocking:
+            retry_after = max(self.circuit_breaker.retry_after(), self.poll_interval)
+            raise CircuitOpenError(
+                f"Circuito aberto: nova tentativa em {retry_after:.1f}s.",
+                retry_after=retry_after,
+            )
+
+        start = time.monotonic()
+        logging.warning("⏸️ Circuito aberto. Aguardando o backend voltar.")
+        while generation is None:
+            wait = max(self.circuit_breaker.retry_after(), self.poll_interval)
+            if self.max_wait is not None:
+                remaining = self.max_wait - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise CircuitOpenError(
+                        f"Circuito aberto por mais de {self.max_wait}s: lote descartado."
+                    )
+                wait = min(wait, remaining)
+            time.sleep(wait)
+            generation = self.circuit_breaker.allow_request()
+        return generation
+
+    def _send(self, data: List[Dict], method: str, generation: int) -> Any:
+        """Envia o lote admitido e registra o resultado no circuito."""
+        try:
+            result = self.api_client.send_request(data, method)
+        except Exception as e:
+            if self.is_failure(e):
+                self.circuit_breaker.record_failure(generation)
+            else:
+                self.circuit_breaker.record_success(generation)
+            raise
+        self.circuit_breaker.record_success(generation)
+        return result
+
+    def _spool(self, data: List[Dict], method: str):
+        """Guarda o lote no spool para reenvio."""
+        self.spool.append(data, method)
+        self._spool_pending = True
@@ -4,7 +4,7 @@ HTTP client module for Subhue API communication.
 
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import requests
 from bs4 import BeautifulSoup
@@ -52,19 +52,27 @@ class HttpClient(ApiClient):
         endpoint_url: str,
         headers: Dict[str, str],
         response_processor: ApiResponseProcessor,
+        timeout: Optional[float] = None,
+        raise_errors: bool = False,
+        health_url: Optional[str] = None,
     ):
         self.endpoint_url = endpoint_url
         self.headers = headers
         self.response_processor = response_processor
+        self.timeout = timeout
+        self.raise_errors = raise_errors
+        self.health_url = health_url or endpoint_url
 
     def send_request(self, data: List[Dict], method: str = "POST") -> Any:
         """Envia requisição HTTP."""
+        response = None
         try:
             response = requests.request(
                 method=method.upper(),
                 url=self.endpoint_url,
                 json=data,
                 headers=self.headers,
+                timeout=self.timeout,
             )
             response.raise_for_status()
             return self.response_processor.process_response(response)
@@ -81,4 +89,22 @@ class HttpClient(ApiClient):
             else:
                 logging.error("📥 Nenhuma resposta da API foi recebida.")
 
+            if self.raise_errors:
+                raise
             return None
+
+    def check_health(self, timeout: float = 5.0) -> bool:
+        """
+        Verifica de forma barata se o backend está respondendo.
+
+        Qualquer resposta abaixo de 500 (inclusive 401 ou 405) indica que o
+        servidor está no ar.
+        """
+        try:
+            response = requests.head(
+                self.health_url, headers=self.headers, timeout=timeout
+            )
+            return response.status_code < 500
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Backend indisponível em {self.health_url}: {e}")
+            return False
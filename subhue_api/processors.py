@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional
 
 import pandas as pd
 
+from .circuit_breaker import CircuitBreakerClient, CircuitOpenError
 from .client import ApiClient
 from .converters import DataConverter
 
@@ -76,15 +77,28 @@ class BatchProcessor:
             f"PAYLOAD_LEN: {len(payload)} - BATCH_SIZE: {batch_size} - SLEEP_TIME: {sleep_time} - MAX_ERRORS: {max_errors}"
         )
         error_count = 0
+        spooled_count = 0
 
         try:
             for i in range(0, len(payload), batch_size):
                 batch = payload[i : i + batch_size]
+                circuit_open = False
                 try:
                     self.api_client.send_request(batch, method)
                     logging.info(
                         f"✅ Enviado lote {i // batch_size + 1} de {len(payload) // batch_size + 1}"
                     )
+                except CircuitOpenError as e:
+                    # Lote guardado no spool ou descartado pela política do
+                    # circuito aberto: não há espera entre lotes
+                    circuit_open = True
+                    if e.spooled:
+                        spooled_count += 1
+                        continue
+                    logging.error(
+                        f"🚫 {e} Descartando {len(payload) - i} registro(s) restantes."
+                    )
+                    break
                 except Exception as e:
                     error_count += 1
                     logging.error(f"❌ Erro ao enviar lote {i // batch_size + 1}: {e}")
@@ -96,8 +110,15 @@ class BatchProcessor:
                         )
                         break
                 finally:
-                    time.sleep(sleep_time)
+                    if not circuit_open:
+                        time.sleep(sleep_time)
+
+            # Reenvia os lotes guardados no spool assim que o backend voltar
+            if spooled_count and isinstance(self.api_client, CircuitBreakerClient):
+                self.api_client.flush_spool()
         except Exception as e:
             logging.error(f"❌ Erro inesperado: {e}")
         finally:
             logging.info(f"📊 Total de erros durante o envio: {error_count}")
+            if spooled_count:
+                logging.info(f"📦 Lotes enviados ao spool: {spooled_count}")
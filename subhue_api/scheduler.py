@@ -0,0 +1,431 @@
+"""
+Scheduler module for sending payloads to multiple Subhue API endpoints.
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+from .circuit_breaker import CircuitBreakerClient, CircuitOpenError
+from .client import ApiClient
+
+
+class Priority(IntEnum):
+    """Prioridades de envio. Valores menores são atendidos primeiro."""
+
+    REALTIME = 0
+    NORMAL = 5
+    BACKFILL = 10
+
+
+@dataclass
+class SendJob:
+    """Trabalho de envio de um payload para um endpoint."""
+
+    endpoint: str
+    payload: List[Dict]
+    priority: int = Priority.NORMAL
+    deadline: Optional[float] = None
+    batch_size: int = 1
+    method: str = "POST"
+    max_errors: Optional[int] = None
+
+    sent_batches: int = 0
+    spooled_batches: int = 0
+    error_count: int = 0
+    expired: bool = False
+    cancelled: bool = False
+    next_index: int = 0
+    in_flight: int = 0
+    retry_starts: List[int] = field(default_factory=list)
+    not_before: float = 0.0
+    sequence: int = 0
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def total_batches(self) -> int:
+        """Número total de lotes do trabalho."""
+        return math.ceil(len(self.payload) / self.batch_size)
+
+    @property
+    def pending_batches(self) -> int:
+        """Número de lotes ainda não enviados, incluindo os adiados."""
+        remaining = max(len(self.payload) - self.next_index, 0)
+        return len(self.retry_starts) + math.ceil(remaining / self.batch_size)
+
+    @property
+    def finished(self) -> bool:
+        """Indica se o trabalho não possui mais lotes a enviar."""
+        return self.done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda a conclusão do trabalho, no máximo até o seu prazo.
+
+        Returns:
+            bool: False se o trabalho não foi concluído dentro do tempo limite
+                ou do prazo
+        """
+        if self.deadline is not None:
+            until_deadline = max(self.deadline - time.monotonic(), 0)
+            timeout = (
+                until_deadline if timeout is None else min(timeout, until_deadline)
+            )
+        return self.done.wait(timeout)
+
+
+class SendScheduler:
+    """
+    Agenda envios para vários endpoints compartilhando um limite global de
+    requisições simultâneas.
+
+    Os trabalhos são divididos em lotes e, a cada vaga liberada, é enviado o
+    próximo lote do trabalho de maior prioridade (menor valor de ``priority``);
+    em caso de empate, vence o prazo mais próximo. Assim, lotes de tempo real
+    passam à frente dos lotes de carga histórica assim que são enfileirados,
+    e as cargas históricas ocupam apenas a capacidade ociosa.
+    """
+
+    def __init__(
+        self,
+        clients: Optional[Dict[str, ApiClient]] = None,
+        max_in_flight: int = 2,
+    ):
+        """
+        Inicializa o agendador.
+
+        Args:
+            clients: Clientes de API indexados pelo nome do endpoint. Os
+                clientes devem lançar exceção em caso de falha; um
+                ``HttpClient`` deve ser criado com ``raise_errors=True``
+            max_in_flight: Número máximo de lotes enviados simultaneamente
+
+        Com um ``CircuitBreakerClient``, lotes recusados com o circuito aberto
+        na política ``WAIT`` não ocupam vaga: são adiados até a próxima
+        verificação de saúde e a vaga é liberada para outros endpoints.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight deve ser maior ou igual a 1.")
+
+        self.clients: Dict[str, ApiClient] = dict(clients or {})
+        self.max_in_flight = max_in_flight
+
+        self._queue: List = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._workers: List[threading.Thread] = []
+        self._running = False
+        self._closed = False
+
+    def register_client(self, endpoint: str, client: ApiClient):
+        """Registra o cliente de API usado para um endpoint."""
+        with self._condition:
+            self.clients[endpoint] = client
+
+    def submit(
+        self,
+        endpoint: str,
+        payload: List[Dict],
+        priority: int = Priority.NORMAL,
+        deadline: Optional[float] = None,
+        batch_size: int = 1,
+        method: str = "POST",
+        max_errors: Optional[int] = None,
+    ) -> SendJob:
+        """
+        Enfileira um payload para envio.
+
+        Args:
+            endpoint: Nome do endpoint registrado em ``clients``
+            payload: Lista de registros a enviar
+            priority: Prioridade do trabalho (ver ``Priority``)
+            deadline: Prazo em segundos, a partir de agora; lotes ainda não
+                enviados quando o prazo expira são descartados
+            batch_size: Tamanho de cada lote
+            method: Método HTTP
+            max_errors: Número de erros que interrompe o trabalho
+
+        Returns:
+            SendJob: O trabalho enfileirado
+
+        Raises:
+            KeyError: Se não houver cliente registrado para o endpoint
+            RuntimeError: Se o agendador já foi encerrado
+        """
+        if endpoint not in self.clients:
+            raise KeyError(
+                f"Endpoint '{endpoint}' sem cliente registrado. Opções válidas: {', '.join(self.clients)}"
+            )
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser maior ou igual a 1.")
+
+        job = SendJob(
+            endpoint=endpoint,
+            payload=payload,
+            priority=priority,
+            deadline=None if deadline is None else time.monotonic() + deadline,
+            batch_size=batch_size,
+            method=method,
+            max_errors=max_errors,
+        )
+        logging.info(
+            f"📥 Trabalho enfileirado: {endpoint} - PRIORITY: {priority} - PAYLOAD_LEN: {len(payload)} - BATCHES: {job.total_batches}"
+        )
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Agendador encerrado: não aceita novos trabalhos.")
+            if not payload:
+                job.done.set()
+                return job
+            job.sequence = next(self._counter)
+            self._push(job)
+            self._condition.notify_all()
+        return job
+
+    def start(self):
+        """Inicia as threads de envio."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Agendador encerrado: não pode ser reiniciado.")
+            if self._running:
+                return
+            self._running = True
+            self._workers = [
+                threading.Thread(
+                    target=self._worker, name=f"subhue-sender-{n}", daemon=True
+                )
+                for n in range(self.max_in_flight)
+            ]
+            self._workers.append(
+                threading.Thread(
+                    target=self._monitor, name="subhue-deadlines", daemon=True
+                )
+            )
+        for worker in self._workers:
+            worker.start()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda até que todos os trabalhos enfileirados sejam concluídos.
+
+        Returns:
+            bool: False se o tempo limite expirou antes da conclusão
+
+        Raises:
+            RuntimeError: Se há trabalhos pendentes e o agendador não está em
+                execução
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._in_flight:
+                if not self._running:
+                    raise RuntimeError(
+                        "Agendador não está em execução: chame start() antes de join()."
+                    )
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self, wait: bool = True):
+        """
+        Encerra as threads de envio.
+
+        Args:
+            wait: Se True, aguarda o envio de todos os trabalhos enfileirados
+        """
+        with self._condition:
+            running = self._running
+            self._closed = True
+        if wait and running:
+            self.join()
+        with self._condition:
+            self._running = False
+            queued = [job for _, _, _, job in self._queue]
+            self._queue.clear()
+            for job in queued:
+                job.cancelled = True
+                self._finish(job)
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self) -> "SendScheduler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=exc_type is None)
+
+    def _push(self, job: SendJob):
+        """Insere o trabalho na fila de prioridade."""
+        deadline = math.inf if job.deadline is None else job.deadline
+        heapq.heappush(self._queue, (job.priority, deadline, job.sequence, job))
+
+    def _cancel(self, job: SendJob):
+        """Cancela o trabalho e o remove da fila. Deve ser chamado com o lock."""
+        job.cancelled = True
+        queue = [entry for entry in self._queue if entry[3] is not job]
+        if len(queue) != len(self._queue):
+            self._queue = queue
+            heapq.heapify(self._queue)
+
+    def _finish(self, job: SendJob):
+        """Marca o trabalho como concluído quando não há lotes pendentes."""
+        if job.done.is_set():
+            return
+        if job.in_flight == 0 and (
+            job.cancelled or job.expired or job.pending_batches == 0
+        ):
+            logging.info(
+                f"📊 Trabalho {job.endpoint} concluído - Lotes enviados: {job.sent_batches} de {job.total_batches} - Spool: {job.spooled_batches} - Erros: {job.error_count}"
+            )
+            job.done.set()
+
+    def _expire_jobs(self):
+        """Remove da fila os trabalhos com prazo expirado. Deve ser chamado com o lock."""
+        now = time.monotonic()
+        expired = [entry for entry in self._queue if entry[1] < now]
+        if not expired:
+            return
+
+        self._queue = [entry for entry in self._queue if entry[1] >= now]
+        heapq.heapify(self._queue)
+        for _, _, _, job in expired:
+            job.expired = True
+            logging.warning(
+                f"⏰ Prazo expirado para {job.endpoint}. Descartando {job.pending_batches} lote(s)."
+            )
+            self._finish(job)
+        self._condition.notify_all()
+
+    def _next_batch(self):
+        """Retira da fila o próximo lote a enviar. Deve ser chamado com o lock."""
+        self._expire_jobs()
+        now = time.monotonic()
+        deferred = []
+        try:
+            while self._queue:
+                entry = heapq.heappop(self._queue)
+                job = entry[3]
+                if job.cancelled:
+                    self._finish(job)
+                    continue
+                if job.not_before > now:
+                    deferred.append(entry)
+                    continue
+
+                if job.retry_starts:
+                    start = job.retry_starts.pop(0)
+                else:
+                    start = job.next_index
+                    job.next_index += job.batch_size
+                job.in_flight += 1
+                if job.pending_batches:
+                    self._push(job)
+                return job, start
+            return None, None
+        finally:
+            for entry in deferred:
+                heapq.heappush(self._queue, entry)
+
+    def _retry_timeout(self) -> Optional[float]:
+        """Segundos até o próximo trabalho adiado voltar a ser elegível."""
+        now = time.monotonic()
+        waits = [
+            entry[3].not_before - now
+            for entry in self._queue
+            if entry[3].not_before > now
+        ]
+        return min(waits) if waits else None
+
+    def _defer(self, job: SendJob, start: int, retry_after: float):
+        """Devolve o lote à fila para nova tentativa. Deve ser chamado com o lock."""
+        job.retry_starts.append(start)
+        job.not_before = time.monotonic() + retry_after
+        if not any(entry[3] is job for entry in self._queue):
+            self._push(job)
+
+    def _monitor(self):
+        """Expira os trabalhos no prazo, mesmo com todas as threads de envio ocupadas."""
+        with self._condition:
+            while self._running:
+                self._expire_jobs()
+                deadlines = [entry[1] for entry in self._queue if entry[1] != math.inf]
+                timeout = (
+                    max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                )
+                self._condition.wait(timeout)
+
+    def _worker(self):
+        """Laço de envio executado por cada thread."""
+        while True:
+            with self._condition:
+                job, start = self._next_batch()
+                while job is None:
+                    if not self._running:
+                        return
+                    self._condition.wait(self._retry_timeout())
+                    job, start = self._next_batch()
+                self._in_flight += 1
+                client = self.clients[job.endpoint]
+
+            batch = job.payload[start : start + job.batch_size]
+            batch_number = start // job.batch_size + 1
+            error = None
+            circuit_error = None
+            try:
+                if isinstance(client, CircuitBreakerClient):
+                    client.send_request(batch, job.method, blocking=False)
+                else:
+                    client.send_request(batch, job.method)
+                logging.info(
+                    f"✅ {job.endpoint}: enviado lote {batch_number} de {job.total_batches}"
+                )
+            except CircuitOpenError as e:
+                circuit_error = e
+            except Exception as e:
+                error = e
+                logging.error(
+                    f"❌ {job.endpoint}: erro ao enviar lote {batch_number}: {e}"
+                )
+
+            with self._condition:
+                self._in_flight -= 1
+                job.in_flight -= 1
+                if circuit_error is not None:
+                    if circuit_error.spooled:
+                        job.spooled_batches += 1
+                    elif circuit_error.retry_after is not None:
+                        if not job.cancelled and not job.expired:
+                            logging.warning(
+                                f"⏸️ {job.endpoint}: lote {batch_number} adiado. {circuit_error}"
+                            )
+                            self._defer(job, start, circuit_error.retry_after)
+                    elif not job.cancelled:
+                        logging.error(
+                            f"🚫 {job.endpoint}: {circuit_error} Descartando lotes restantes."
+                        )
+                        self._cancel(job)
+                elif error is None:
+                    job.sent_batches += 1
+                else:
+                    job.error_count += 1
+                    if job.max_errors is not None and job.error_count >= job.max_errors:
+                        if not job.cancelled:
+                            logging.error(
+                                f"🚫 {job.endpoint}: número máximo de erros ({job.max_errors}) atingido. Interrompendo envio."
+                            )
+                            self._cancel(job)
+                self._finish(job)
+                self._condition.notify_all()
@@ -11,6 +11,12 @@ import pandas as pd
 from dotenv import load_dotenv
 
 from .auth import TokenAuth
+from .circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerClient,
+    OpenPolicy,
+    PayloadSpool,
+)
 from .client import ApiResponseProcessor, HttpClient
 from .config import EndpointConfig
 from .converters import DataConverter
@@ -18,17 +24,40 @@ from .processors import BatchProcessor, DataFrameProcessor
 
 load_dotenv()
 
+# Tempo limite padrão, em segundos, das requisições protegidas por circuit breaker
+CIRCUIT_BREAKER_TIMEOUT = 30.0
+
 
 class SubhueAPI:
     """Classe de fachada que integra os componentes para interação com a API Subhue."""
 
-    def __init__(self, endpoint: str, environment: str = "prod"):
+    def __init__(
+        self,
+        endpoint: str,
+        environment: str = "prod",
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        spool_path: Optional[str] = None,
+        open_policy: Optional[OpenPolicy] = None,
+        timeout: Optional[float] = None,
+        raise_errors: bool = False,
+    ):
         """
         Inicializa a API Subhue.
 
         Args:
             endpoint: O tipo de endpoint a ser usado ('altas', 'atendimentos', etc.)
             environment: O ambiente a ser usado ('prod', 'dev', 'local')
+            circuit_breaker: Circuit breaker que protege o envio; sem ele o
+                comportamento anterior é mantido
+            spool_path: Arquivo onde os lotes recusados com o circuito aberto
+                são guardados e de onde são reenviados quando o circuito fecha
+            open_policy: O que fazer com os lotes enquanto o circuito está
+                aberto. Padrão: ``SPOOL`` se houver ``spool_path``, senão
+                ``WAIT`` (aguarda o backend voltar)
+            timeout: Tempo limite, em segundos, de cada requisição. Com
+                circuit breaker, o padrão é ``CIRCUIT_BREAKER_TIMEOUT``
+            raise_errors: Se True, o cliente HTTP lança exceção em caso de falha
+                em vez de retornar None (necessário para o ``SendScheduler``)
         """
         # Configura a dependência de componentes
         self.config = EndpointConfig(environment)
@@ -54,9 +83,27 @@ class SubhueAPI:
         }
 
         # Cliente HTTP
+        if timeout is None and circuit_breaker is not None:
+            timeout = CIRCUIT_BREAKER_TIMEOUT
         self.api_client = HttpClient(
-            self.endpoint_url, self.headers, self.response_processor
+            self.endpoint_url,
+            self.headers,
+            self.response_processor,
+            timeout=timeout,
+            raise_errors=raise_errors or circuit_breaker is not None,
+            health_url=self.config.endpoints.base_url,
         )
+
+        # Circuit breaker
+        self.circuit_breaker = circuit_breaker
+        if circuit_breaker is not None:
+            if circuit_breaker.health_check is None:
+                circuit_breaker.health_check = self.api_client.check_health
+            spool = PayloadSpool(spool_path) if spool_path else None
+            self.api_client = CircuitBreakerClient(
+                self.api_client, circuit_breaker, spool, open_policy=open_policy
+            )
+
         self.batch_processor = BatchProcessor(self.api_client)
 
         logging.info("Token da API SUBHUE obtido com sucesso!")
@@ -98,6 +145,14 @@ class SubhueAPI:
             payload, batch_size, sleep_time, method, max_errors
         )
 
+    def replay_spool(self) -> int:
+        """
+        Reenvia os lotes guardados no spool enquanto o circuito estava aberto.
+        """
+        if not isinstance(self.api_client, CircuitBreakerClient):
+            return 0
+        return self.api_client.replay_spool()
+
 
 if __name__ == "__main__":
     from dotenv import load_dotenv